@@ -0,0 +1,34 @@
+"""add partial loadsPower index on historic_energy_data
+
+Revision ID: b7e41c2d9a05
+Revises: 8f6de9dc8d0d
+Create Date: 2026-10-14 10:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e41c2d9a05'
+down_revision: Union[str, Sequence[str], None] = '8f6de9dc8d0d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # solcast_forecast and agile_rates are already indexed on period_end by their
+    # unique constraints; the demand history scan filters on variable first.
+    op.create_index(
+        "ix_historic_energy_data_loads_power_period_end",
+        "historic_energy_data",
+        ["period_end"],
+        postgresql_include=["value"],
+        postgresql_where=sa.text("variable = 'loadsPower'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_historic_energy_data_loads_power_period_end", table_name="historic_energy_data")
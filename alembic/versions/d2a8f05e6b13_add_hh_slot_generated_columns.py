@@ -0,0 +1,49 @@
+"""add generated hh_slot columns
+
+Revision ID: d2a8f05e6b13
+Revises: b7e41c2d9a05
+Create Date: 2026-10-14 11:03:47.681925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8f05e6b13'
+down_revision: Union[str, Sequence[str], None] = 'b7e41c2d9a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+HH_SLOT_SQL = "floor(date_part('hour', period_end) * 2 + date_part('minute', period_end) / 30)::smallint"
+
+
+def upgrade() -> None:
+    for table in ("historic_energy_data", "solcast_forecast"):
+        op.add_column(table, sa.Column("hh_slot", sa.SmallInteger(), sa.Computed(HH_SLOT_SQL, persisted=True)))
+
+    # Carry hh_slot in the loadsPower index so the demand history stays an index-only scan
+    op.drop_index("ix_historic_energy_data_loads_power_period_end", table_name="historic_energy_data")
+    op.create_index(
+        "ix_historic_energy_data_loads_power_period_end",
+        "historic_energy_data",
+        ["period_end"],
+        postgresql_include=["value", "hh_slot"],
+        postgresql_where=sa.text("variable = 'loadsPower'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_historic_energy_data_loads_power_period_end", table_name="historic_energy_data")
+    op.create_index(
+        "ix_historic_energy_data_loads_power_period_end",
+        "historic_energy_data",
+        ["period_end"],
+        postgresql_include=["value"],
+        postgresql_where=sa.text("variable = 'loadsPower'"),
+    )
+
+    for table in ("solcast_forecast", "historic_energy_data"):
+        op.drop_column(table, "hh_slot")
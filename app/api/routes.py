@@ -1,6 +1,11 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
 import os
+import time
 from datetime import datetime, timezone
+from functools import lru_cache
+import orjson
+import pandas as pd
 from pydantic import BaseModel
 
 from app.core.optimiser import mvp_cost_minimiser
@@ -8,6 +13,34 @@ from app.services.data_provider import get_optimiser_inputs
 
 router = APIRouter()
 
+
+@lru_cache(maxsize=1)
+def _isots(epoch_sec: int) -> str:
+    """ISO-8601 UTC timestamp for `epoch_sec`, reused for every response in that second."""
+    return datetime.fromtimestamp(epoch_sec, timezone.utc).isoformat()
+
+
+def _orjson_default(obj):
+    # orjson handles datetime natively but not pandas' Timestamp subclass
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered by orjson, with native numpy and pandas timestamp support.
+
+    Returning an instance directly from a route skips FastAPI's `jsonable_encoder`
+    walk over every schedule value.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+# Schedule columns totalled for the response summary, in unpacking order
+SUMMARY_COLUMNS = ["cost_gbp", "pv_estimate", "demand", "grid_import_kwh", "grid_export_kwh"]
+
 @router.get("/health")
 def health():
     return {"status": "ok"}
@@ -24,11 +57,11 @@ class MVPOptimiseRequest(BaseModel):
 
 
 
-@router.post("/optimise/mvp")
+@router.post("/optimise/mvp", response_class=ORJSONResponse)
 def optimise_mvp(req: MVPOptimiseRequest):
     """
     MVP optimiser endpoint: compute optimal battery dispatch schedule for lowest cost.
-    Uses linear programming (CVXPY) to minimise electricity costs over forecast horizon.
+    Uses linear programming (HiGHS) to minimise electricity costs over forecast horizon.
     
     Returns a schedule with half-hourly breakdown of:
     - demand, solar generation, import/export prices
@@ -51,11 +84,8 @@ def optimise_mvp(req: MVPOptimiseRequest):
         )
 
         # Compute summary stats
-        total_cost = float(schedule["cost_gbp"].sum())
-        total_solar = float(schedule["pv_estimate"].sum())
-        total_demand = float(schedule["demand"].sum())
-        total_import = float(schedule["grid_import_kwh"].sum())
-        total_export = float(schedule["grid_export_kwh"].sum())
+        totals = schedule[SUMMARY_COLUMNS].to_numpy(dtype=float).sum(axis=0)
+        total_cost, total_solar, total_demand, total_import, total_export = map(float, totals)
         # compute export revenue using per-timestep export price if provided
         # Compute export revenue from per-timestep export price column (expected name: `export_price` in pence/kWh)
         if "export_price" in schedule.columns:
@@ -63,9 +93,9 @@ def optimise_mvp(req: MVPOptimiseRequest):
         else:
             total_export_revenue = 0.0
 
-        return {
+        return ORJSONResponse({
             "status": "success",
-            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "generated_at": _isots(int(time.time())),
             "summary": {
                 "total_cost_gbp": total_cost,
                 "total_solar_kwh": total_solar,
@@ -75,6 +105,6 @@ def optimise_mvp(req: MVPOptimiseRequest):
                 "total_grid_export_revenue_gbp": total_export_revenue,
             },
             "schedule": schedule.to_dict(orient="records"),
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Optimisation failed: {str(e)}")
\ No newline at end of file
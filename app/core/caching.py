@@ -0,0 +1,32 @@
+"""
+Time-bucketed caching for external API fetches.
+"""
+import time
+from functools import lru_cache, wraps
+
+import pandas as pd
+
+
+def ttl_cache(ttl_seconds: int, maxsize: int = 8):
+    """Cache a function's results for up to `ttl_seconds`.
+
+    Results are keyed on the positional arguments plus the current
+    `ttl_seconds`-wide time bucket, so an entry stops being hit once the clock
+    enters the next bucket. DataFrame results are copied on the way out, so
+    callers can add columns without touching the cached frame. The wrapper keeps
+    `cache_clear` from `lru_cache`.
+    """
+    def decorator(func):
+        @lru_cache(maxsize=maxsize)
+        def cached(ttl_bucket: int, *args):
+            return func(*args)
+
+        @wraps(func)
+        def wrapper(*args):
+            result = cached(int(time.time() // ttl_seconds), *args)
+            return result.copy() if isinstance(result, pd.DataFrame) else result
+
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+
+    return decorator
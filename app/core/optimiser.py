@@ -1,14 +1,312 @@
 """
-Linear programming battery optimiser using CVXPY.
+Linear programming battery optimiser using HiGHS (via highspy).
 Minimises cost subject to energy balance, SOC bounds, and power constraints.
 """
-import cvxpy as cp
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from typing import NamedTuple
+
+import highspy
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
+from numba import njit
+
+from app.core.timeslots import half_hour_slot, time_of_day_slot
+
+
+class OptimiserInputs(NamedTuple):
+    """Half-hourly optimiser inputs as column arrays (struct-of-arrays).
+
+    Prices are pence/kWh; pv_estimate and demand are kWh per half-hour.
+    """
+    period_end: pd.DatetimeIndex
+    price: np.ndarray
+    pv_estimate: np.ndarray
+    demand: np.ndarray
+    export_price: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def _build_constraints(n: int) -> sp.csr_matrix:
+    """Build the equality constraint matrix for an `n`-step horizon.
+
+    Variables are ordered `[b_charge, b_discharge, g_import, g_export, soc]`,
+    each a block of `n`. The sparsity pattern only depends on `n`, so the matrix
+    is built once per horizon length and reused across solves.
+
+    Rows:
+      - energy balance: -charge + discharge + import - export = demand - solar
+      - SOC dynamics: soc[t] - soc[t-1] - charge[t] + discharge[t] = 0
+        (with the initial SOC moved to the right-hand side for t = 0)
+    """
+    eye = sp.identity(n, format="csr")
+    soc_diff = eye - sp.eye(n, k=-1, format="csr")
+    return sp.bmat(
+        [
+            [-eye, eye, eye, -eye, None],
+            [-eye, eye, None, None, soc_diff],
+        ],
+        format="csr",
+    )
+
+
+@lru_cache(maxsize=None)
+def _tie_break(n: int) -> np.ndarray:
+    """Fixed pseudo-random cost perturbation for an `n`-step horizon.
+
+    Flat or repeated tariffs leave many schedules with the same cost, and a
+    hot-started solve would pick whichever is nearest the previous basis. Adding
+    a tiny fixed-seed cost (at most £1e-5/kWh) to every column makes the optimum
+    unique, so identical inputs give the same schedule whatever was solved before.
+    """
+    tie_break = np.random.default_rng(0).uniform(0.0, 1e-5, 5 * n)
+    tie_break.setflags(write=False)
+    return tie_break
+
+
+# One HiGHS model per horizon length, each with a lock as a Highs instance is not
+# safe to share between threads. Successive solves only change costs and bounds,
+# so HiGHS keeps the previous optimal basis and hot-starts from it.
+_problem_cache: dict[int, tuple[highspy.Highs, threading.Lock]] = {}
+_problem_cache_lock = threading.Lock()
+
+
+def _cached_problem(n: int) -> tuple[highspy.Highs, threading.Lock]:
+    """Return the cached HiGHS model for an `n`-step horizon, building it on first use."""
+    with _problem_cache_lock:
+        entry = _problem_cache.get(n)
+        if entry is None:
+            a_eq = _build_constraints(n).tocsc()
+            lp = highspy.HighsLp()
+            lp.num_col_ = 5 * n
+            lp.num_row_ = 2 * n
+            lp.col_cost_ = np.zeros(5 * n)
+            lp.col_lower_ = np.zeros(5 * n)
+            lp.col_upper_ = np.zeros(5 * n)
+            lp.row_lower_ = np.zeros(2 * n)
+            lp.row_upper_ = np.zeros(2 * n)
+            lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+            lp.a_matrix_.start_ = a_eq.indptr
+            lp.a_matrix_.index_ = a_eq.indices
+            lp.a_matrix_.value_ = a_eq.data
+
+            highs = highspy.Highs()
+            highs.setOptionValue("output_flag", False)
+            # Serial dual simplex without presolve: presolve would discard the basis
+            # that the next solve hot-starts from, and the parallel (PAMI) variant is
+            # no faster on LPs this small
+            highs.setOptionValue("solver", "simplex")
+            highs.setOptionValue("simplex_strategy", 1)
+            highs.setOptionValue("presolve", "off")
+            highs.passModel(lp)
+            entry = _problem_cache[n] = (highs, threading.Lock())
+        return entry
+
+
+def _float_array(series: pd.Series) -> np.ndarray:
+    return np.ascontiguousarray(series.to_numpy(dtype=np.float64, copy=False))
+
+
+def _as_optimiser_inputs(inputs: pd.DataFrame | OptimiserInputs) -> OptimiserInputs:
+    """Return `inputs` as C-contiguous float64 column arrays.
+
+    The LP assembly, Numba post-processing and result frame all work on these
+    buffers, so they are normalised once up front.
+    """
+    if isinstance(inputs, OptimiserInputs):
+        return OptimiserInputs(
+            pd.DatetimeIndex(inputs.period_end),
+            *(np.ascontiguousarray(col, dtype=np.float64) for col in inputs[1:]),
+        )
+    missing = [c for c in ["period_end", "price", "pv_estimate", "demand"] if c not in inputs.columns]
+    if missing:
+        raise ValueError(f"Missing columns ({'/'.join(missing)}) in inputs data")
+    # Expect a per-period export price column named `export_price` (pence/kWh)
+    if "export_price" not in inputs.columns:
+        raise ValueError("inputs_df must include an 'export_price' column with pence/kWh values")
+    return OptimiserInputs(
+        period_end=pd.DatetimeIndex(inputs["period_end"]),
+        price=_float_array(inputs["price"]),
+        pv_estimate=_float_array(inputs["pv_estimate"]),
+        demand=_float_array(inputs["demand"]),
+        export_price=_float_array(inputs["export_price"]),
+    )
+
+
+def _clean_inputs(inputs: OptimiserInputs) -> OptimiserInputs:
+    """Order rows by period_end and keep only rows with finite price, solar and demand."""
+    # get_optimiser_inputs returns rows ORDER BY period_end, so only sort when needed
+    if not inputs.period_end.is_monotonic_increasing:
+        order = np.argsort(inputs.period_end.asi8, kind="stable")
+        inputs = OptimiserInputs(inputs.period_end[order], *(col[order] for col in inputs[1:]))
+    # np.isfinite is False for NaN, so one pass covers both missing and infinite values
+    mask = np.isfinite(inputs.price) & np.isfinite(inputs.pv_estimate) & np.isfinite(inputs.demand)
+    if not mask.all():
+        # drop any rows where we don't have complete finite data
+        inputs = OptimiserInputs(inputs.period_end[mask], *(col[mask] for col in inputs[1:]))
+    return inputs
+
+
+@njit(cache=True, fastmath=True)
+def _postprocess(b_charge_v, b_discharge_v, g_import_v, g_export_v, soc_v,
+                 import_prices, export_prices_gbp, battery_capacity_kwh, eps):
+    """Derive the displayed flows, SOC % and per-timestep cost in one fused pass.
+
+    Net battery and grid flows are split so each period shows only net
+    charging OR discharging (import OR export); flows within `eps` of zero
+    are reported as zero.
+
+    Returns (batt_charge, batt_discharge, grid_import, grid_export,
+             net_batt, net_grid, soc_pct, timestep_cost).
+    """
+    n = soc_v.shape[0]
+    batt_charge = np.zeros(n)
+    batt_discharge = np.zeros(n)
+    grid_import = np.zeros(n)
+    grid_export = np.zeros(n)
+    net_batt = np.empty(n)
+    net_grid = np.empty(n)
+    soc_pct = np.empty(n)
+    timestep_cost = np.empty(n)
+    for t in range(n):
+        nb = b_charge_v[t] - b_discharge_v[t]
+        ng = g_import_v[t] - g_export_v[t]
+        if nb > eps:
+            batt_charge[t] = nb
+        elif nb < -eps:
+            batt_discharge[t] = -nb
+        if ng > eps:
+            grid_import[t] = ng
+        elif ng < -eps:
+            grid_export[t] = -ng
+        net_batt[t] = nb
+        net_grid[t] = ng
+        soc_pct[t] = soc_v[t] / battery_capacity_kwh * 100.0
+        timestep_cost[t] = g_import_v[t] * import_prices[t] - g_export_v[t] * export_prices_gbp[t]
+    return (batt_charge, batt_discharge, grid_import, grid_export,
+            net_batt, net_grid, soc_pct, timestep_cost)
+
 
+def _solve_lp(import_prices, export_prices_gbp, solar_gen, demand, init_soc_kwh,
+              soc_min_kwh, soc_max_kwh, max_batt_charge_energy, max_batt_discharge_energy,
+              grid_penalty_weight):
+    """Solve the dispatch LP with HiGHS.
 
+    Returns (b_charge, b_discharge, g_import, g_export, soc) arrays.
+    """
+    n = import_prices.shape[0]
+    # Small incentive to charge in periods where future prices are higher
+    alpha = 0.01
+    # (inputs are non-empty here, so the max is always defined)
+    price_diff = np.maximum(import_prices.max() - import_prices, 0.0)
+
+    c = np.concatenate([
+        -alpha * price_diff,  # b_charge
+        np.zeros(n),  # b_discharge
+        import_prices + grid_penalty_weight,  # g_import
+        -export_prices_gbp + grid_penalty_weight,  # g_export
+        np.zeros(n),  # soc
+    ])
+    c += _tie_break(n)
+
+    b_eq = np.concatenate([demand - solar_gen, np.zeros(n)])
+    b_eq[n] = init_soc_kwh
+    lower = np.zeros(5 * n)
+    upper = np.empty(5 * n)
+    upper[:n] = max_batt_charge_energy  # Power limits
+    upper[n:2 * n] = max_batt_discharge_energy
+    upper[2 * n:3 * n] = max_batt_charge_energy  # Grid limits (same as battery for simplicity)
+    upper[3 * n:4 * n] = max_batt_discharge_energy
+    lower[4 * n:] = soc_min_kwh  # SOC bounds
+    upper[4 * n:] = soc_max_kwh
+
+    highs, lock = _cached_problem(n)
+    cols = np.arange(5 * n, dtype=np.int32)
+    rows = np.arange(2 * n, dtype=np.int32)
+    with lock:
+        highs.changeColsCost(cols.size, cols, c)
+        highs.changeColsBounds(cols.size, cols, lower, upper)
+        highs.changeRowsBounds(rows.size, rows, b_eq, b_eq)
+        highs.run()
+        status = highs.getModelStatus()
+        if status != highspy.HighsModelStatus.kOptimal:
+            # A stale basis from the previous solve can leave the hot start stuck
+            # (e.g. `kUnknown` on a feasible LP); retry once from scratch
+            highs.clearSolver()
+            highs.run()
+            status = highs.getModelStatus()
+        if status != highspy.HighsModelStatus.kOptimal:
+            raise ValueError(f"Optimisation failed: {highs.modelStatusToString(status)}")
+        x = np.array(highs.getSolution().col_value)
+
+    return x.reshape(5, n)
+
+
+def _memoise_on_inputs(maxsize: int):
+    """Cache optimiser results keyed on a hash of the input data and parameters.
+
+    Solcast/Agile inputs only change every 30 minutes, so repeated calls within a
+    dispatch window return the cached schedule instead of re-solving. Inputs that
+    can't be hashed (missing columns, unparseable timestamps) bypass the cache.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        cache: OrderedDict[bytes, pd.DataFrame] = OrderedDict()
+        lock = threading.Lock()
+
+        def make_key(inputs: OptimiserInputs, params: dict) -> bytes:
+            period_end = inputs.period_end.asi8
+            values = np.concatenate(inputs[1:])
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(period_end.tobytes())
+            digest.update(values.tobytes())
+            digest.update(repr(tuple(params.items())).encode())
+            return digest.digest()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            try:
+                inputs = _as_optimiser_inputs(arguments.pop("inputs_df"))
+            except (TypeError, ValueError):
+                return func(*args, **kwargs)
+
+            key = make_key(inputs, arguments)
+            with lock:
+                cached = cache.get(key)
+                if cached is not None:
+                    cache.move_to_end(key)
+                    return cached.copy()
+
+            # Hand over the already-normalised arrays so the solve doesn't redo the
+            # float64 conversion (it is a no-op on contiguous float64 input)
+            result = func(inputs, **arguments)
+
+            with lock:
+                cache[key] = result.copy()
+                while len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
+
+
+@_memoise_on_inputs(maxsize=32)
 def mvp_cost_minimiser(
-    inputs_df: pd.DataFrame,
+    inputs_df: pd.DataFrame | OptimiserInputs,
     battery_capacity_kwh: float = 15.0,
     initial_soc_pct: float = 50.0,
     min_soc_pct: float = 20.0,
@@ -24,7 +322,9 @@ def mvp_cost_minimiser(
     charge/discharge schedule given solar forecast, prices, and demand.
 
     Args:
-        inputs_df: DataFrame with period_end (UTC), pv_estimate (kWh), price (pence/kWh), and demand (kWh)
+        inputs_df: `OptimiserInputs` arrays (as returned by `get_optimiser_inputs`) or a DataFrame
+                   with period_end (UTC), pv_estimate (kWh), price and export_price (pence/kWh),
+                   and demand (kWh) columns
         battery_capacity_kwh: Total battery capacity
         initial_soc_pct: Starting state of charge %
         min_soc_pct, max_soc_pct: Bounds on SOC
@@ -37,37 +337,16 @@ def mvp_cost_minimiser(
                                 batt_discharge_kwh, grid_import_kwh, grid_export_kwh,
                                 soc_kwh, soc_pct, net_battery_kwh, cost_gbp
     """
-    inputs_df = inputs_df.sort_values("period_end").reset_index(drop=True)
-
-    # Ensure we only keep rows with finite price, solar and demand values
-    numeric_cols = [c for c in ["price", "pv_estimate", "demand"] if c in inputs_df.columns]
-    if not numeric_cols:
-        raise ValueError("Missing numeric columns (price/pv_estimate/demand) in inputs data")
-    mask = inputs_df[numeric_cols].notna().all(axis=1)
-    # also ensure values are finite
-    for c in numeric_cols:
-        mask &= np.isfinite(inputs_df[c])
-    dropped = (~mask).sum()
-    if dropped > 0:
-        # drop any rows where we don't have complete finite data
-        inputs_df = inputs_df.loc[mask].reset_index(drop=True)
-    if inputs_df.empty:
+    inputs = _clean_inputs(_as_optimiser_inputs(inputs_df))
+    if inputs.period_end.size == 0:
         raise ValueError("No overlapping data available for optimisation after joining solar, price and demand")
-    # fill any remaining small missing solar/demand values with conservative defaults
-    if "pv_estimate" in inputs_df.columns:
-        inputs_df["pv_estimate"] = inputs_df["pv_estimate"].fillna(0.0)
-    if "demand" in inputs_df.columns:
-        inputs_df["demand"] = inputs_df["demand"].fillna(0.5)
-
-    n = len(inputs_df)
-    import_prices = inputs_df["price"].values / 100.0  # Convert pence to £/kWh
-    solar_gen = inputs_df["pv_estimate"].values
-    demand = inputs_df["demand"].values
-    # Expect a per-period export price column named `export_price` (pence/kWh)
-    if "export_price" not in inputs_df.columns:
-        raise ValueError("inputs_df must include an 'export_price' column with pence/kWh values")
 
-    export_prices_pence = inputs_df["export_price"].values
+    n = inputs.period_end.size
+    prices_pence = inputs.price
+    import_prices = prices_pence / 100.0  # Convert pence to £/kWh
+    solar_gen = inputs.pv_estimate
+    demand = inputs.demand
+    export_prices_pence = inputs.export_price
     export_prices_gbp = export_prices_pence / 100.0
 
     # Battery and system parameters
@@ -78,90 +357,77 @@ def mvp_cost_minimiser(
     soc_max_kwh = (max_soc_pct / 100.0) * battery_capacity_kwh
     init_soc_kwh = (initial_soc_pct / 100.0) * battery_capacity_kwh
 
-    # Decision variables
-    b_charge = cp.Variable(n, nonneg=True)  # Battery charge (kWh)
-    b_discharge = cp.Variable(n, nonneg=True)  # Battery discharge (kWh)
-    g_import = cp.Variable(n, nonneg=True)  # Grid import (kWh)
-    g_export = cp.Variable(n, nonneg=True)  # Grid export (kWh)
-    soc = cp.Variable(n)  # State of charge (kWh)
-
-    constraints = []
-
-    # SOC dynamics and bounds
-    for t in range(n):
-        # SOC balance: SOC[t] = SOC[t-1] + charge[t] - discharge[t]
-        if t == 0:
-            constraints.append(soc[t] == init_soc_kwh + b_charge[t] - b_discharge[t])
-        else:
-            constraints.append(soc[t] == soc[t - 1] + b_charge[t] - b_discharge[t])
-
-        # SOC bounds
-        constraints.append(soc[t] >= soc_min_kwh)
-        constraints.append(soc[t] <= soc_max_kwh)
-
-        # Power limits
-        constraints.append(b_charge[t] <= max_batt_charge_energy)
-        constraints.append(b_discharge[t] <= max_batt_discharge_energy)
-
-        # Grid limits (same as battery for simplicity)
-        constraints.append(g_import[t] <= max_batt_charge_energy)
-        constraints.append(g_export[t] <= max_batt_discharge_energy)
-
-        # Energy balance: solar + discharge + import = demand + charge + export
-        constraints.append(
-            solar_gen[t] + b_discharge[t] + g_import[t] - b_charge[t] - g_export[t] == demand[t]
-        )
-
     # Objective: minimise cost with small grid penalty
     grid_penalty_weight = 0.001
-    penalty = grid_penalty_weight * cp.sum(g_import + g_export)
-    # Use per-period export prices where available
-    cost = cp.sum(cp.multiply(g_import, import_prices) - cp.multiply(g_export, export_prices_gbp)) + penalty
-    # Small incentive to charge in periods where future prices are higher
-    try:
-        future_max_price = float(import_prices.max())
-        price_diff = future_max_price - import_prices
-        alpha = 0.01
-        cost = cost - alpha * cp.sum(cp.multiply(b_charge, price_diff))
-    except Exception:
-        pass
-
-    problem = cp.Problem(cp.Minimize(cost), constraints)
-    problem.solve(verbose=False)
 
-    if problem.status != cp.OPTIMAL:
-        raise ValueError(f"Optimisation failed: {problem.status}")
+    b_charge_v, b_discharge_v, g_import_v, g_export_v, soc_v = _solve_lp(
+        import_prices, export_prices_gbp, solar_gen, demand, init_soc_kwh,
+        soc_min_kwh, soc_max_kwh, max_batt_charge_energy, max_batt_discharge_energy,
+        grid_penalty_weight,
+    )
 
     # Build results DataFrame
-    # Per-timestep cost (GBP)
-    timestep_cost = g_import.value * import_prices - g_export.value * export_prices_gbp
-    soc_pct = (soc.value / battery_capacity_kwh) * 100
-
-    result_df = inputs_df[["period_end"]].copy()
-    result_df["demand"] = demand
-    result_df["pv_estimate"] = solar_gen
-    result_df["price"] = inputs_df["price"]
-    # Compute net battery and grid flows and present only net charging OR discharging
-    eps = 1e-3
-    net_batt = (b_charge.value - b_discharge.value)
-    disp_batt_charge = np.where(net_batt > eps, net_batt, 0.0)
-    disp_batt_discharge = np.where(net_batt < -eps, -net_batt, 0.0)
-
-    net_grid = (g_import.value - g_export.value)
-    disp_grid_import = np.where(net_grid > eps, net_grid, 0.0)
-    disp_grid_export = np.where(net_grid < -eps, -net_grid, 0.0)
-
-    result_df["batt_charge_kwh"] = disp_batt_charge
-    result_df["batt_discharge_kwh"] = disp_batt_discharge
-    result_df["grid_import_kwh"] = disp_grid_import
-    result_df["grid_export_kwh"] = disp_grid_export
-    result_df["soc_kwh"] = soc.value
-    result_df["soc_pct"] = soc_pct
-    result_df["net_battery_kwh"] = net_batt
-    result_df["net_grid_kwh"] = net_grid
-    result_df["cost_gbp"] = timestep_cost
-    # include export price used (pence/kWh) to make it available for downstream UI
-    result_df["export_price_pence"] = export_prices_pence
+    (
+        disp_batt_charge, disp_batt_discharge, disp_grid_import, disp_grid_export,
+        net_batt, net_grid, soc_pct, timestep_cost,
+    ) = _postprocess(
+        b_charge_v, b_discharge_v, g_import_v, g_export_v, soc_v,
+        import_prices, export_prices_gbp, battery_capacity_kwh, 1e-3,
+    )
+
+    result_df = pd.DataFrame(
+        {
+            # A tz-aware DatetimeIndex goes in as-is: `.to_numpy()` would box it to objects
+            "period_end": inputs.period_end,
+            "demand": demand,
+            "pv_estimate": solar_gen,
+            "price": prices_pence,
+            "batt_charge_kwh": disp_batt_charge,
+            "batt_discharge_kwh": disp_batt_discharge,
+            "grid_import_kwh": disp_grid_import,
+            "grid_export_kwh": disp_grid_export,
+            "soc_kwh": soc_v,
+            "soc_pct": soc_pct,
+            "net_battery_kwh": net_batt,
+            "net_grid_kwh": net_grid,
+            "cost_gbp": timestep_cost,
+            # include export price used (pence/kWh) to make it available for downstream UI
+            "export_price_pence": export_prices_pence,
+        },
+        copy=False,
+    )
 
     return result_df
 
+
+
+def mvp_cost_minimiser_legacy(
+    solar_df: pd.DataFrame,
+    prices_df: pd.DataFrame,
+    demand_profile: pd.DataFrame,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Adapter for the older three-frame call signature of `mvp_cost_minimiser`.
+
+    Joins the Solcast (`PeriodEnd`, `PvEstimate`) and Octopus (`PeriodEnd`, `price`)
+    frames, looks demand up from the `time_of_day`/`energy_kwh` profile by half-hour
+    slot (0.5 kWh where the profile has no entry) and uses `export_price_pence` as a
+    flat export price, then delegates to `mvp_cost_minimiser`.
+    """
+    merged = solar_df.merge(prices_df[["PeriodEnd", "price"]], on="PeriodEnd", how="left")
+
+    slot_demand = np.full(48, 0.5)
+    slot_demand[time_of_day_slot(demand_profile["time_of_day"])] = (
+        demand_profile["energy_kwh"].to_numpy(dtype=np.float64)
+    )
+    export_price = kwargs.get("export_price_pence", 15.0)
+
+    inputs = OptimiserInputs(
+        period_end=pd.DatetimeIndex(merged["PeriodEnd"]),
+        price=_float_array(merged["price"]),
+        pv_estimate=_float_array(merged["PvEstimate"]),
+        demand=slot_demand[half_hour_slot(merged["PeriodEnd"])],
+        export_price=np.full(len(merged), export_price, dtype=np.float64),
+    )
+    return mvp_cost_minimiser(inputs, **kwargs)
@@ -0,0 +1,31 @@
+"""
+Half-hour-of-day slot helpers.
+
+A slot numbers the 48 half-hours of a UTC day as `hour * 2 + minute // 30`,
+matching the generated `hh_slot` column on `historic_energy_data` and
+`solcast_forecast`. Slots are plain integers, so they make cheap
+groupby/merge keys compared with `datetime.time` objects.
+"""
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+# SQL expression for the generated `hh_slot` columns (timestamp without tz, so immutable)
+HH_SLOT_SQL = "floor(date_part('hour', period_end) * 2 + date_part('minute', period_end) / 30)::smallint"
+
+# `datetime.time` at the start of each slot, indexable by a slot array
+SLOT_TIMES = np.array([time(slot // 2, (slot % 2) * 30) for slot in range(48)], dtype=object)
+# "HH:MM" label for the start of each slot, likewise indexable by slot
+SLOT_LABELS = np.array([f"{slot // 2:02d}:{(slot % 2) * 30:02d}" for slot in range(48)], dtype=object)
+
+
+def half_hour_slot(timestamps: pd.Series) -> np.ndarray:
+    """Return the half-hour-of-day slot (0-47) for each timestamp as int32."""
+    dt = timestamps.dt
+    return dt.hour.to_numpy(dtype=np.int32) * 2 + dt.minute.to_numpy(dtype=np.int32) // 30
+
+
+def time_of_day_slot(times) -> np.ndarray:
+    """Return the half-hour slot (0-47) for each `datetime.time` as int32."""
+    return np.fromiter((t.hour * 2 + t.minute // 30 for t in times), dtype=np.int32)
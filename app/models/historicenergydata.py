@@ -1,10 +1,11 @@
 import uuid
-from sqlalchemy import Column, DateTime, Float
+from sqlalchemy import Column, Computed, DateTime, Float, SmallInteger, String, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from app.core.database import Base
+from app.core.timeslots import HH_SLOT_SQL
 
 class HistoricEnergyData(Base):
-    __tablename__ = "solcast_forecast"
+    __tablename__ = "historic_energy_data"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     period_end = Column(DateTime, nullable=False)
@@ -13,6 +14,8 @@ class HistoricEnergyData(Base):
     name = Column(String, nullable=True)
     value = Column(Float, nullable=True)
     time = Column(String, nullable=True)
+    # Half-hour-of-day slot (0-47), computed by Postgres; see app.core.timeslots
+    hh_slot = Column(SmallInteger, Computed(HH_SLOT_SQL, persisted=True))
 
     __table_args__ = (
         UniqueConstraint('period_end', 'variable', name='uq_period_variable'),
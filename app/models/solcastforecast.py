@@ -1,7 +1,8 @@
 import uuid
-from sqlalchemy import Column, DateTime, Float
+from sqlalchemy import Column, Computed, DateTime, Float, SmallInteger
 from sqlalchemy.dialects.postgresql import UUID
 from app.core.database import Base
+from app.core.timeslots import HH_SLOT_SQL
 
 class SolcastForecast(Base):
     __tablename__ = "solcast_forecast"
@@ -9,3 +10,5 @@ class SolcastForecast(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     period_end = Column(DateTime, nullable=False, unique=True)
     solar_kwh = Column(Float, nullable=False)
+    # Half-hour-of-day slot (0-47), computed by Postgres; see app.core.timeslots
+    hh_slot = Column(SmallInteger, Computed(HH_SLOT_SQL, persisted=True))
@@ -1,93 +1,141 @@
 from datetime import datetime, timezone
 
+import numpy as np
 import pandas as pd
 
 from sqlalchemy import text
 
 from app.core.database import SessionLocal
+from app.core.optimiser import OptimiserInputs
 
+# One record per result row; the TIMESTAMP columns hold naive UTC times
+_INPUT_ROW_DTYPE = np.dtype([
+    ("period_end", "M8[us]"),
+    ("pv_estimate", np.float64),
+    ("price", np.float64),
+    ("export_price", np.float64),
+    ("demand", np.float64),
+])
 
-def get_optimiser_inputs() -> pd.DataFrame:
-    """Return a merged half-hourly DataFrame for the optimiser.
+# 5-minute `loadsPower` readings within the last `:days` days, shared by both queries
+_LOAD_HISTORY_CTE = """five_min AS (
+        SELECT
+            period_end,
+            hh_slot,
+            SUM(value) AS value_kw
+        FROM public.historic_energy_data
+        WHERE variable = 'loadsPower'
+        AND period_end >= now() - make_interval(days => :days)
+        GROUP BY period_end, hh_slot
+    )"""
+
+# Built once at import; `days` is bound per call so the text never changes between runs
+_OPTIMISER_SQL = text(f"""WITH {_LOAD_HISTORY_CTE},
+
+    half_hour_history AS (
+        SELECT
+            hh_slot,
+            AVG(value_kw) / 2.0 AS avg_kwh
+        FROM five_min
+        GROUP BY hh_slot
+    ),
+
+    future_half_hours AS (
+        SELECT
+            sf.period_end,
+            sf.solar_kwh,
+            sf.hh_slot
+        FROM solcast_forecast sf
+        WHERE sf.period_end >= now()
+    )
+
+    SELECT
+        f.period_end as period_end,
+        f.solar_kwh AS pv_estimate,
+        ar.import_price as price,
+        ar.export_price,
+        h.avg_kwh AS demand
+    FROM future_half_hours f
+    JOIN half_hour_history h
+        ON f.hh_slot = h.hh_slot
+    JOIN agile_rates ar
+        ON ar.period_end = f.period_end
+    ORDER BY f.period_end;
+    """)
 
-    Columns returned:
-      - PeriodEnd: timezone-aware UTC timestamp (half-hour resolution)
-      - PvEstimate: solar energy in kWh for the half-hour
-      - price: import price (pence)
+_DEMAND_PROFILE_SQL = text(f"""WITH {_LOAD_HISTORY_CTE}
+
+    SELECT
+        hh_slot,
+        AVG(value_kw) / 2.0 AS energy_kwh
+    FROM five_min
+    GROUP BY hh_slot
+    ORDER BY hh_slot;
+    """)
+
+
+def get_optimiser_inputs(days: int = 7) -> OptimiserInputs:
+    """Return merged half-hourly optimiser inputs as column arrays.
+
+    Fields returned (one entry per future half-hour, ordered by period_end):
+      - period_end: timezone-aware UTC DatetimeIndex (half-hour resolution)
+      - price: import price (pence/kWh)
+      - pv_estimate: solar energy in kWh for the half-hour
       - demand: demand energy in kWh for the half-hour
+      - export_price: export price (pence/kWh)
 
-    The function builds a half-hour series for the last `days` days, left-joins
-    `solcast_forecast`, `agile_rates`, and an aggregated view of
-    `historic_energy_data` (5-minute -> half-hour), and returns a tidy DataFrame.
+    The function joins future `solcast_forecast` rows with `agile_rates` and an
+    aggregated half-hour-of-day view of the last `days` days of
+    `historic_energy_data` (5-minute -> half-hour), matching on the stored
+    `hh_slot` column of both tables. The result rows are packed into a
+    structured array without an intermediate DataFrame; NULLs become NaN.
     """
     session = SessionLocal()
     try:
-        sql = text("""WITH five_min AS (
-            SELECT 
-                period_end, 
-                SUM(value) AS value_kw
-            FROM public.historic_energy_data
-            WHERE variable = 'loadsPower'
-            AND period_end >= now() - interval '7 days'
-            GROUP BY period_end
-        ),
-
-        half_hour_history AS (
-            SELECT
-                floor(date_part('hour', period_end) * 2 
-                    + date_part('minute', period_end) / 30) AS hh_slot,
-                AVG(value_kw) / 2.0 AS avg_kwh
-            FROM five_min
-            GROUP BY hh_slot
-        ),
-
-        future_half_hours AS (
-            SELECT
-                sf.period_end,
-                sf.solar_kwh,
-                floor(date_part('hour', sf.period_end) * 2 
-                    + date_part('minute', sf.period_end) / 30) AS hh_slot
-            FROM solcast_forecast sf
-            WHERE sf.period_end >= now()
+        result = session.execute(_OPTIMISER_SQL, {"days": days})
+        # np.fromiter needs plain tuples for a structured dtype, not Row objects
+        records = np.fromiter(map(tuple, result), dtype=_INPUT_ROW_DTYPE)
+
+        return OptimiserInputs(
+            period_end=pd.DatetimeIndex(records["period_end"]).tz_localize("UTC"),
+            price=np.ascontiguousarray(records["price"]),
+            pv_estimate=np.ascontiguousarray(records["pv_estimate"]),
+            # demand_forecast_kwh -> kWh for half-hour
+            demand=np.ascontiguousarray(records["demand"]),
+            export_price=np.ascontiguousarray(records["export_price"]),
         )
+    finally:
+        session.close()
 
-        SELECT
-            f.period_end as period_end,
-            f.solar_kwh AS pv_estimate,
-            ar.import_price as price,
-            ar.export_price,
-            h.avg_kwh AS demand
-        FROM future_half_hours f
-        JOIN half_hour_history h
-            ON f.hh_slot = h.hh_slot
-        JOIN agile_rates ar
-            ON ar.period_end = f.period_end
-        ORDER BY f.period_end;
-        """)
-        result = session.execute(sql)
-        # Use SQLAlchemy result mappings for robust dict conversion
-        try:
-            mapped = result.mappings().all()
-            rows = [dict(r) for r in mapped]
-        except Exception:
-            rows = []
-        df = pd.DataFrame(rows)
-        if df.empty:
-            return pd.DataFrame(columns=["period_end", "pv_estimate", "price", "export_price", "demand"]) 
-
-        # Normalize column names and types
-        # handle both tz-aware and tz-naive timestamps returned by the DB
-        try:
-            df["period_end"] = pd.to_datetime(df["period_end"]).dt.tz_convert("UTC")
-        except TypeError:
-            df["period_end"] = pd.to_datetime(df["period_end"]).dt.tz_localize("UTC")
-        df["pv_estimate"] = df["pv_estimate"].astype(float)
-        # price: may be NULL
-        df["price"] = df["price"].astype(float)
-        df["export_price"] = df["export_price"].astype(float)
-        # demand_forecast_kwh -> kWh for half-hour
-        df["demand"] = df["demand"].astype(float) 
-
-        return df[["period_end", "pv_estimate", "price", "export_price", "demand"]]
+
+def get_demand_profile(days: int = 7) -> pd.DataFrame:
+    """Return the average demand per half-hour-of-day over the last `days` days.
+
+    The `historic_energy_data` 5-minute `loadsPower` readings are averaged per
+    `hh_slot` in SQL, so at most 48 rows come back. Columns:
+      - hh_slot: half-hour-of-day slot (0-47), see `app.core.timeslots`
+      - energy_kwh: average demand energy in kWh for the half-hour
+    """
+    session = SessionLocal()
+    try:
+        rows = session.execute(_DEMAND_PROFILE_SQL, {"days": days}).all()
+        slots, energy = zip(*rows) if rows else ((), ())
+        return pd.DataFrame({
+            "hh_slot": np.array(slots, dtype=np.int32),
+            "energy_kwh": np.array(energy, dtype=np.float64),
+        })
+    finally:
+        session.close()
+
+
+def get_latest_solcast_period_end() -> datetime | None:
+    """Return the latest `solcast_forecast.period_end` (naive UTC), or None when empty.
+
+    A single-row probe, cheap enough to check freshness before the full
+    `get_optimiser_inputs` join.
+    """
+    session = SessionLocal()
+    try:
+        return session.execute(text("SELECT max(period_end) FROM solcast_forecast")).scalar()
     finally:
         session.close()
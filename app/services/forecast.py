@@ -1,15 +1,22 @@
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
+from app.core.timeslots import half_hour_slot
 from app.services import solcast, foxess
+from app.services.data_provider import get_optimiser_inputs
 
 SOLCAST_API_KEY = os.environ.get("SOLCAST_API_KEY")
 FOXESS_API_KEY = os.environ.get("FOXESS_API_KEY")
 
+# Runs the Solcast API fallback alongside the FoxESS one
+_api_pool = ThreadPoolExecutor(max_workers=1)
+
 
 def forecast_demand_last_week_avg(api_key: str | None = None) -> pd.DataFrame:
     """Simple MVP demand forecast: average last 7 days of FoxESS load history by half-hour-of-day.
 
-    Returns DataFrame with `time_of_day` (time) and `energy_kwh` (float) columns.
+    Returns DataFrame with `time_of_day` (time), `hh_slot` (half-hour-of-day, 0-47)
+    and `energy_kwh` (float) columns; `hh_slot` joins onto `forecast_solar_and_prices`.
     """
     if api_key is None:
         api_key = FOXESS_API_KEY
@@ -23,7 +30,8 @@ def forecast_demand_last_week_avg(api_key: str | None = None) -> pd.DataFrame:
 def forecast_solar_and_prices(pv_system_id: str | None = None) -> pd.DataFrame:
     """Fetch solar forecast + Octopus Agile prices from DB or FoxESS.
 
-    Returns merged DataFrame with PeriodEnd, PvEstimate, and price columns.
+    Returns merged DataFrame with PeriodEnd, PvEstimate, price and `hh_slot`
+    (half-hour-of-day, 0-47) columns; `hh_slot` is the key for joining a demand profile.
     """
     solcast_key = os.environ.get("SOLCAST_API_KEY")
     foxess_key = os.environ.get("FOXESS_API_KEY")
@@ -31,16 +39,31 @@ def forecast_solar_and_prices(pv_system_id: str | None = None) -> pd.DataFrame:
     if not foxess_key:
         raise ValueError("FoxESS API key required for prices")
     
-    solar = solcast.get_solar_forecast(solcast_key, pv_system_id)
+    # Both series come out of the same DB join, so run it once and split the columns;
+    # any rows mean solcast_forecast holds future periods, so no freshness probe is needed
+    try:
+        inputs = get_optimiser_inputs()
+        if not inputs.period_end.size:
+            inputs = None
+    except Exception:
+        inputs = None
+
+    if inputs is not None:
+        solar = pd.DataFrame({"PeriodEnd": inputs.period_end, "PvEstimate": inputs.pv_estimate})
+        prices = pd.DataFrame({"PeriodEnd": inputs.period_end, "price": inputs.price})
+    else:
+        solar_future = _api_pool.submit(
+            solcast.get_solar_forecast, solcast_key, pv_system_id, prefer_db=False
+        )
+        foxess.init_api(foxess_key)
+        prices = foxess.get_agile_prices(prefer_db=False)
+        solar = solar_future.result()
 
     # Parse PeriodEnd robustly (accept date-only or timezone-less strings)
     solar["PeriodEnd"] = pd.to_datetime(solar["PeriodEnd"], utc=True, errors="coerce")
     # Drop unparseable rows
     solar = solar.dropna(subset=["PeriodEnd"]) 
-    solar["time_of_day"] = solar["PeriodEnd"].dt.time
-    
-    foxess.init_api(foxess_key)
-    prices = foxess.get_agile_prices()
+    solar["hh_slot"] = half_hour_slot(solar["PeriodEnd"])
 
     merged = solar.merge(prices, on="PeriodEnd", how="left")
     return merged
@@ -1,12 +1,18 @@
 import os
-from datetime import timedelta, datetime, timezone
+from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
 import foxesscloud.openapi as f
 
-from app.services.data_provider import get_optimiser_inputs
+from app.core.caching import ttl_cache
+from app.core.timeslots import SLOT_LABELS, SLOT_TIMES, half_hour_slot
+from app.services.data_provider import get_demand_profile, get_optimiser_inputs
 
 FOXESS_API_KEY = os.environ.get("FOXESS_API_KEY")
 
+# Agile prices are published once a day: reuse fetched prices for up to 30 minutes
+AGILE_CACHE_TTL_SECONDS = 1800
+
 # Work mode constants (from legacy code)
 FOXESS_WORK_MODE_SELF_USE = 0
 FOXESS_WORK_MODE_CHARGE = 1
@@ -22,20 +28,28 @@ def init_api(api_key: str | None = None):
     except Exception:
         pass
 
-def get_agile_prices(days: int = 7) -> pd.DataFrame:
+def get_agile_prices(days: int = 7, prefer_db: bool = True) -> pd.DataFrame:
     """Return `PeriodEnd` and `price` from DB-backed inputs (no external API).
 
     This sources prices from `agile_rates` via the joined `get_optimiser_inputs`.
+    Pass `prefer_db=False` to go straight to the FoxESS API.
     """
     # Try DB first
-    try:
-        df = get_optimiser_inputs(days=days)
-        if df is not None and not df.empty:
-            return df[["PeriodEnd", "price"]].copy()
-    except Exception:
-        pass
+    if prefer_db:
+        try:
+            inputs = get_optimiser_inputs(days=days)
+            if inputs.period_end.size:
+                return pd.DataFrame({"PeriodEnd": inputs.period_end, "price": inputs.price})
+        except Exception:
+            pass
 
     # Fallback to FoxESS API behaviour (kept for compatibility/tests)
+    return _fetch_agile_prices()
+
+
+@ttl_cache(AGILE_CACHE_TTL_SECONDS)
+def _fetch_agile_prices() -> pd.DataFrame:
+    """Fetch Agile prices from the FoxESS API."""
     agile_prices = f.get_agile_times()
     prices_df = pd.DataFrame(agile_prices["prices"])
 
@@ -46,30 +60,40 @@ def get_agile_prices(days: int = 7) -> pd.DataFrame:
     if pd.isna(base_time_dt):
         raise ValueError("Unable to parse agile base_time from FoxESS response")
 
-    prices_df["PeriodEnd"] = base_time_dt + pd.to_timedelta(prices_df["hour"], unit="h") + timedelta(minutes=30)
-    prices_df["PeriodEnd"] = prices_df["PeriodEnd"].dt.tz_convert("UTC")
+    # Period end = base time + hour offset + 30 minutes, as int64 UTC nanoseconds
+    hour_ns = np.rint(prices_df["hour"].to_numpy(dtype=np.float64) * 3_600_000_000_000).astype(np.int64)
+    prices_df["PeriodEnd"] = pd.DatetimeIndex(base_time_dt.value + hour_ns + 1_800_000_000_000, tz="UTC")
     return prices_df[["PeriodEnd", "price"]]
 
 def get_demand_forecast(days: int = 7) -> pd.DataFrame:
     """Return average half-hourly demand (kWh) over the last `days` days from DB.
 
-    This replaces the old API-backed implementation and uses `get_optimiser_inputs`.
+    This replaces the old API-backed implementation; the half-hour-of-day average
+    is computed in SQL by `get_demand_profile`. Columns are `time_of_day`,
+    `hh_slot` (0-47, the join key used by `forecast_solar_and_prices`) and
+    `energy_kwh`.
     """
     # Try DB first
     try:
-        df = get_optimiser_inputs(days=days)
-        if df is not None and not df.empty:
-            df["time_of_day"] = df["PeriodEnd"].dt.time
-            avg = df.groupby("time_of_day")["demand"].mean().reset_index()
-            avg = avg.rename(columns={"demand": "energy_kwh"})
-            return avg
+        profile = get_demand_profile(days=days)
+        if not profile.empty:
+            slots = profile["hh_slot"].to_numpy()
+            return pd.DataFrame({
+                "time_of_day": SLOT_TIMES[slots],
+                "hh_slot": slots,
+                "energy_kwh": profile["energy_kwh"].to_numpy(),
+            })
     except Exception:
         pass
 
     # Fallback to API behaviour
     load_history = pd.DataFrame(f.get_history('week', d=datetime.today(), v=f.power_vars))
-    load_history = load_history.loc[load_history['variable'] == 'loadsPower'].dropna()['data'].explode().apply(pd.Series)
-    load_history["time"] = pd.to_datetime(load_history["time"], utc=True, errors="coerce")
+    load_points = load_history.loc[load_history['variable'] == 'loadsPower'].dropna()['data']
+    # Flatten the {"time", "value"} points into one frame in a single constructor
+    # call rather than building a Series per point with explode().apply(pd.Series)
+    load_history = pd.DataFrame([point for points in load_points for point in points])
+    # Parse as UTC, then work on naive UTC times: diff/resample are much cheaper without a tz
+    load_history["time"] = pd.to_datetime(load_history["time"], utc=True, errors="coerce").dt.tz_localize(None)
     load_history = load_history.dropna(subset=["time", "value"]) 
     load_history = load_history.set_index("time").sort_index()
     load_history["dt_hours"] = load_history.index.to_series().diff().dt.total_seconds().div(3600)
@@ -77,27 +101,33 @@ def get_demand_forecast(days: int = 7) -> pd.DataFrame:
     load_history = load_history.dropna(subset=["energy_kwh"]) 
     half_hourly = load_history["energy_kwh"].resample("30min", label="right", closed="right").sum()
     half_hourly = half_hourly.reset_index()
-    half_hourly["time_utc"] = half_hourly["time"].dt.tz_convert("UTC")
-    half_hourly["time_of_day"] = half_hourly["time_utc"].dt.time
-    avg_profile = half_hourly.groupby("time_of_day")["energy_kwh"].mean()
-    return avg_profile.reset_index()
+    # Group on the integer half-hour slot, not datetime.time objects, and only map
+    # back to times of day for the returned profile
+    slot = half_hour_slot(half_hourly["time"])
+    avg_profile = half_hourly["energy_kwh"].groupby(slot).mean()
+    slots = avg_profile.index.to_numpy()
+    return pd.DataFrame({
+        "time_of_day": SLOT_TIMES[slots],
+        "hh_slot": slots,
+        "energy_kwh": avg_profile.to_numpy(),
+    })
 
 def create_foxess_schedule_df(optimiser_result_df: pd.DataFrame) -> pd.DataFrame:
-    schedule_data = []
-    for i, row in optimiser_result_df.iterrows():
-        end_time = row["PeriodEnd"]
-        start_time = end_time - timedelta(minutes=30)
-        start_str = start_time.strftime("%H:%M")
-        end_str = end_time.strftime("%H:%M")
-        net_battery = row.get("net_battery_kwh", 0)
-        if net_battery > 0.05:
-            work_mode = FOXESS_WORK_MODE_CHARGE
-        elif net_battery < -0.05:
-            work_mode = FOXESS_WORK_MODE_DISCHARGE
-        else:
-            work_mode = FOXESS_WORK_MODE_SELF_USE
-        schedule_data.append({"start": start_str, "end": end_str, "WorkMode": int(work_mode)})
-    return pd.DataFrame(schedule_data)
+    # Period ends sit on half-hour boundaries, so labels come from the 48 precomputed
+    # slot strings; each period starts one slot before it ends
+    end_slot = half_hour_slot(optimiser_result_df["PeriodEnd"])
+    net_battery = optimiser_result_df.get("net_battery_kwh", pd.Series(0.0, index=optimiser_result_df.index))
+    net_battery = net_battery.to_numpy(dtype=float)
+    work_mode = np.select(
+        [net_battery > 0.05, net_battery < -0.05],
+        [FOXESS_WORK_MODE_CHARGE, FOXESS_WORK_MODE_DISCHARGE],
+        FOXESS_WORK_MODE_SELF_USE,
+    )
+    return pd.DataFrame({
+        "start": SLOT_LABELS[(end_slot - 1) % 48],
+        "end": SLOT_LABELS[end_slot],
+        "WorkMode": work_mode.astype(int),
+    })
 
 def send_schedule(device_sn: str, schedule_df, min_soc: int = 20, max_soc: int = 90, fd_pwr: float = 3000):
     """Send schedule (DataFrame with start,end,WorkMode) to FoxESS cloud via signed_post helper."""
@@ -105,29 +135,26 @@ def send_schedule(device_sn: str, schedule_df, min_soc: int = 20, max_soc: int =
     midnight_break = schedule_df["start"] == '00:00'
     schedule_df["grp"] = (mode_change | midnight_break.fillna(True)).cumsum()
     grouped = schedule_df.groupby(["grp", "WorkMode"], as_index=False).agg({"start": "first", "end": "last"})
-    groups = []
-    for _, row in grouped.iterrows():
-        start_h, start_m = map(int, row["start"][-5:].split(":"))
-        end_h, end_m = map(int, row["end"][-5:].split(":"))
-        if end_m == 0:
-            end_m = 59
-            end_h = (end_h - 1 + 24) % 24
-        else:
-            end_m = (end_m - 1) % 60
-        work_mode = row["WorkMode"]
-        group = {
+    if grouped.empty:
+        # split(expand=True) yields no columns for an empty schedule
+        groups = []
+    else:
+        start = grouped["start"].str[-5:].str.split(":", expand=True).astype(int)
+        end = grouped["end"].str[-5:].str.split(":", expand=True).astype(int)
+        # FoxESS end times are inclusive, so step back one minute (00:00 -> 23:59)
+        end_on_hour = end[1] == 0
+        groups = pd.DataFrame({
             "enable": 1,
-            "startHour": start_h,
-            "startMinute": start_m,
-            "endHour": end_h,
-            "endMinute": end_m,
-            "workMode": work_mode,
+            "startHour": start[0],
+            "startMinute": start[1],
+            "endHour": np.where(end_on_hour, (end[0] - 1) % 24, end[0]),
+            "endMinute": np.where(end_on_hour, 59, end[1] - 1),
+            "workMode": grouped["WorkMode"],
             "minSocOnGrid": min_soc,
             "fdSoc": min_soc,
             "fdPwr": fd_pwr,
             "maxSoc": max_soc,
-        }
-        groups.append(group)
+        }).to_dict(orient="records")
     url_to_sign = "/op/v1/device/scheduler/enable"
     payload = {"deviceSN": device_sn, "groups": groups}
     response = f.signed_post(path=url_to_sign, body=payload)
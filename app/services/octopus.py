@@ -5,6 +5,8 @@ from datetime import datetime, timedelta
 
 OCTOPUS_API_KEY = os.environ.get("OCTOPUS_API_KEY")
 
+_session = requests.Session()
+
 def get_consumption(api_key: str | None, mpan: str, serial: str, days: int = 7) -> pd.DataFrame:
     """Fetch consumption records from Octopus Energy and return half-hourly energy kWh with PeriodEnd.
 
@@ -23,13 +25,14 @@ def get_consumption(api_key: str | None, mpan: str, serial: str, days: int = 7)
         "period_to": end_date.isoformat(),
         "page_size": 25000,
     }
-    r = requests.get(consumption_url, auth=(api_key, ""), params=params, timeout=20)
+    r = _session.get(consumption_url, auth=(api_key, ""), params=params, timeout=20)
     r.raise_for_status()
     results = r.json().get("results", [])
     df = pd.DataFrame(results)
     if df.empty:
         return pd.DataFrame(columns=["interval_end", "energy_kwh"])
-    df["interval_start"] = pd.to_datetime(df["interval_start"])
-    df["interval_end"] = pd.to_datetime(df["interval_end"])
+    # Octopus sends ISO-8601 with "Z" or a BST offset; an explicit format skips
+    # per-value inference and utc=True folds the mixed offsets into one UTC dtype
+    df["interval_end"] = pd.to_datetime(df["interval_end"], format="%Y-%m-%dT%H:%M:%S%z", utc=True, cache=True)
     df = df.rename(columns={"consumption": "energy_kwh"})
     return df[["interval_end", "energy_kwh"]]
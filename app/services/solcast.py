@@ -1,36 +1,85 @@
 import os
-import io
 import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-from app.services.data_provider import get_optimiser_inputs
+from app.core.caching import ttl_cache
+from app.services.data_provider import get_latest_solcast_period_end, get_optimiser_inputs
 
+# Solcast allows 10 API calls a day: reuse a fetched forecast for up to 30 minutes
+SOLCAST_CACHE_TTL_SECONDS = 1800
 
-def get_solar_forecast(solcast_api_key: str | None = None, pv_system_id: str | None = None, days: int = 7) -> pd.DataFrame:
+# Skip the DB once its newest forecast period is older than this; re-probe every minute
+SOLCAST_DB_STALE_AFTER = timedelta(minutes=30)
+SOLCAST_PROBE_TTL_SECONDS = 60
+
+# Shared session so repeat fetches reuse the pooled HTTPS connection
+_session = requests.Session()
+
+
+def get_solar_forecast(
+    solcast_api_key: str | None = None,
+    pv_system_id: str | None = None,
+    days: int = 7,
+    prefer_db: bool = True,
+) -> pd.DataFrame:
     """Return the solar forecast, preferring DB but falling back to Solcast API.
 
-    Signature kept for compatibility; when DB has data it will be used.
+    Signature kept for compatibility; when DB has fresh data it will be used.
+    Pass `prefer_db=False` to go straight to the API.
     """
     # Require explicit credentials for API usage (keeps behaviour predictable in tests)
     if solcast_api_key is None or pv_system_id is None:
         raise ValueError("Solcast API key and PV system ID must be provided")
-    # Try DB first (if available)
-    try:
-        df = get_optimiser_inputs(days=days)
-        if not df.empty:
-            return df[["PeriodEnd", "PvEstimate"]].copy()
-    except Exception:
-        pass
+    # Try DB first (if available), skipping the full inputs join when it is stale
+    if prefer_db and _db_forecast_is_fresh():
+        try:
+            inputs = get_optimiser_inputs(days=days)
+            if inputs.period_end.size:
+                return pd.DataFrame({"PeriodEnd": inputs.period_end, "PvEstimate": inputs.pv_estimate})
+        except Exception:
+            pass
+
+    return _fetch_solar_forecast(solcast_api_key, pv_system_id)
+
 
+@ttl_cache(SOLCAST_CACHE_TTL_SECONDS)
+def _fetch_solar_forecast(solcast_api_key: str, pv_system_id: str) -> pd.DataFrame:
+    """Fetch and parse the Solcast CSV forecast."""
     url = f"https://api.solcast.com.au/rooftop_sites/{pv_system_id}/forecasts"
     credentials = requests.auth.HTTPBasicAuth(solcast_api_key, "")
     params = {"format": "csv"}
-    resp = requests.get(url, auth=credentials, params=params, timeout=20)
-    resp.raise_for_status()
-    df = pd.read_csv(io.BytesIO(resp.content), parse_dates=["PeriodEnd"])  # PeriodEnd in UTC
+    # Parse straight off the socket rather than buffering the whole body first
+    with _session.get(url, auth=credentials, params=params, timeout=20, stream=True) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True  # undo any gzip transfer encoding
+        # Only parse the columns used; the rest (Period, PvEstimate10/90) would
+        # otherwise be inferred and kept for nothing
+        df = pd.read_csv(
+            resp.raw,
+            usecols=lambda col: col in ("PeriodEnd", "PvEstimate"),
+            dtype={"PvEstimate": np.float64},
+            parse_dates=["PeriodEnd"],  # PeriodEnd in UTC
+        )
     if "PvEstimate" in df.columns:
         df["PvEstimate"] = df["PvEstimate"] * 0.5
     else:
         df["PvEstimate"] = 0
     return df[["PeriodEnd", "PvEstimate"]]
+
+
+@ttl_cache(SOLCAST_PROBE_TTL_SECONDS, maxsize=1)
+def _solcast_latest_period_end() -> datetime | None:
+    """Latest stored Solcast period end."""
+    return get_latest_solcast_period_end()
+
+
+def _db_forecast_is_fresh() -> bool:
+    """Whether `solcast_forecast` still holds a recent forecast (False if the DB is unreachable)."""
+    try:
+        latest = _solcast_latest_period_end()
+    except Exception:
+        return False
+    now_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+    return latest is not None and now_utc - latest <= SOLCAST_DB_STALE_AFTER
@@ -43,6 +43,20 @@ def sample_demand_profile():
     return pd.DataFrame(data)
 
 
+@pytest.fixture
+def sample_inputs_df(sample_solar_df, sample_prices_df, sample_demand_profile):
+    """Joined optimiser inputs in the shape returned by `get_optimiser_inputs`."""
+    inputs = sample_solar_df.merge(sample_prices_df, on="PeriodEnd", how="left")
+    demand_map = sample_demand_profile.set_index("time_of_day")["energy_kwh"].to_dict()
+    return pd.DataFrame({
+        "period_end": inputs["PeriodEnd"],
+        "pv_estimate": inputs["PvEstimate"],
+        "price": inputs["price"],
+        "export_price": 15.0,
+        "demand": inputs["PeriodEnd"].dt.time.map(lambda t: demand_map.get(t, 0.5)),
+    })
+
+
 @pytest.fixture
 def optimiser_params():
     """Standard optimiser parameters."""
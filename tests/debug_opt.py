@@ -1,5 +1,5 @@
 import pandas as pd
-from app.core.optimiser import mvp_cost_minimiser
+from app.core.optimiser import mvp_cost_minimiser_legacy
 
 solar = pd.DataFrame({
     "PeriodEnd": pd.date_range("2025-09-20", periods=2, freq="30min", tz="UTC"),
@@ -14,5 +14,5 @@ demand_profile = pd.DataFrame({
     "energy_kwh": [0.5,0.5]
 })
 params = {"battery_capacity_kwh":15.0,"initial_soc_pct":50.0,"min_soc_pct":20.0,"max_soc_pct":90.0,"charge_power_kw":3.0,"discharge_power_kw":3.0,"export_price_pence":15.0}
-res = mvp_cost_minimiser(solar, prices, demand_profile, **params)
+res = mvp_cost_minimiser_legacy(solar, prices, demand_profile, **params)
 print(res.to_string(index=False))
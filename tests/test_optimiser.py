@@ -2,7 +2,8 @@
 import pytest
 import pandas as pd
 import numpy as np
-from app.core.optimiser import mvp_cost_minimiser
+from unittest.mock import patch
+from app.core.optimiser import OptimiserInputs, _as_optimiser_inputs, _solve_lp, mvp_cost_minimiser, mvp_cost_minimiser_legacy
 
 
 class TestOptimiser:
@@ -124,3 +125,116 @@ class TestOptimiser:
         first_net = result.iloc[0]["batt_charge_kwh"] - result.iloc[0]["batt_discharge_kwh"]
         expected_soc_after_first = expected_first_soc + first_net
         np.testing.assert_allclose(result.iloc[0]["soc_kwh"], expected_soc_after_first, rtol=1e-5)
+
+    def test_optimiser_reuses_problem_for_same_horizon(self, sample_inputs_df, optimiser_params):
+        """Test that repeated solves share one cached HiGHS model but reflect the latest inputs."""
+        from app.core.optimiser import _build_constraints, _cached_problem
+
+        first = mvp_cost_minimiser(inputs_df=sample_inputs_df, **optimiser_params)
+        cached = _build_constraints(len(sample_inputs_df))
+        cached_problem = _cached_problem(len(sample_inputs_df))
+
+        cheaper = sample_inputs_df.assign(price=sample_inputs_df["price"] / 2)
+        second = mvp_cost_minimiser(inputs_df=cheaper, **optimiser_params)
+
+        assert _build_constraints(len(sample_inputs_df)) is cached
+        assert _cached_problem(len(sample_inputs_df)) is cached_problem
+        assert second["cost_gbp"].sum() < first["cost_gbp"].sum()
+        np.testing.assert_allclose(second["price"], cheaper["price"])
+
+    def test_optimiser_caches_repeated_inputs(self, sample_inputs_df, optimiser_params):
+        """Test that identical inputs are served from the result cache without re-solving."""
+        mvp_cost_minimiser.cache_clear()
+        first = mvp_cost_minimiser(inputs_df=sample_inputs_df, **optimiser_params)
+        first["cost_gbp"] = 0.0  # mutating a returned frame must not poison the cache
+
+        with patch("app.core.optimiser._solve_lp", wraps=_solve_lp) as mock_solve:
+            second = mvp_cost_minimiser(inputs_df=sample_inputs_df.copy(), **optimiser_params)
+            mock_solve.assert_not_called()
+            mvp_cost_minimiser(inputs_df=sample_inputs_df, **{**optimiser_params, "initial_soc_pct": 60.0})
+            mock_solve.assert_called_once()
+
+        assert second["cost_gbp"].abs().sum() > 0
+
+    def test_optimiser_repeatable_after_other_solves(self, sample_inputs_df, optimiser_params):
+        """Test that a hot-started solve gives the same schedule for the same inputs."""
+        first = mvp_cost_minimiser(inputs_df=sample_inputs_df, **optimiser_params)
+        flat = sample_inputs_df.assign(price=20.0, export_price=5.0)
+        for initial_soc_pct in (30, 50, 80):
+            mvp_cost_minimiser(inputs_df=flat, **{**optimiser_params, "initial_soc_pct": initial_soc_pct})
+        mvp_cost_minimiser.cache_clear()
+        again = mvp_cost_minimiser(inputs_df=sample_inputs_df, **optimiser_params)
+        pd.testing.assert_frame_equal(again, first)
+
+    def test_optimiser_recovers_from_stalled_hot_start(self):
+        """Test that a hot start HiGHS can't finish is re-solved from scratch rather than failing."""
+        from app.core.optimiser import _problem_cache
+
+        # This pair of solves, in this order, left HiGHS reporting Unknown on a fresh 4-step model
+        _problem_cache.pop(4, None)
+        period_end = pd.date_range("2025-09-20 00:30", periods=4, freq="30min", tz="UTC")
+        first = pd.DataFrame({
+            "period_end": period_end,
+            "price": [20.21, 29.59, 9.62, 39.17],
+            "export_price": [14.15, 11.69, 3.15, 10.38],
+            "pv_estimate": [0.868, 1.901, 0.375, 1.035],
+            "demand": [0.652, 0.423, 0.206, 1.418],
+        })
+        second = pd.DataFrame({
+            "period_end": period_end,
+            "price": 20.0,
+            "export_price": 5.0,
+            "pv_estimate": [2.67, 1.847, 0.28, 0.16],
+            "demand": [1.152, 0.37, 1.126, 1.15],
+        })
+        mvp_cost_minimiser(inputs_df=first, initial_soc_pct=84.02)
+        result = mvp_cost_minimiser(inputs_df=second, initial_soc_pct=30.17)
+        assert len(result) == 4
+
+    def test_optimiser_sorts_unordered_inputs(self, sample_inputs_df, optimiser_params):
+        """Test that unsorted inputs give the same schedule as time-ordered ones."""
+        ordered = mvp_cost_minimiser(inputs_df=sample_inputs_df, **optimiser_params)
+        shuffled = sample_inputs_df.sample(frac=1, random_state=0)
+        mvp_cost_minimiser.cache_clear()
+        result = mvp_cost_minimiser(inputs_df=shuffled, **optimiser_params)
+        assert result["period_end"].is_monotonic_increasing
+        pd.testing.assert_frame_equal(result, ordered)
+
+    def test_optimiser_accepts_array_inputs(self, sample_inputs_df, optimiser_params):
+        """Test that OptimiserInputs arrays give the same schedule as the equivalent DataFrame."""
+        from_df = mvp_cost_minimiser(inputs_df=sample_inputs_df, **optimiser_params)
+        arrays = OptimiserInputs(
+            period_end=pd.DatetimeIndex(sample_inputs_df["period_end"]),
+            price=sample_inputs_df["price"].to_numpy(),
+            pv_estimate=sample_inputs_df["pv_estimate"].to_numpy(),
+            demand=sample_inputs_df["demand"].to_numpy(),
+            export_price=sample_inputs_df["export_price"].to_numpy(),
+        )
+        from_arrays = mvp_cost_minimiser(inputs_df=arrays, **optimiser_params)
+        pd.testing.assert_frame_equal(from_arrays, from_df)
+
+    def test_optimiser_legacy_adapter_matches(self, sample_solar_df, sample_prices_df, sample_demand_profile,
+                                              sample_inputs_df, optimiser_params):
+        """Test that the three-frame adapter gives the same schedule as pre-joined inputs."""
+        joined = mvp_cost_minimiser(inputs_df=sample_inputs_df, **optimiser_params)
+        legacy = mvp_cost_minimiser_legacy(sample_solar_df, sample_prices_df, sample_demand_profile, **optimiser_params)
+        pd.testing.assert_frame_equal(legacy, joined)
+
+    def test_optimiser_upcasts_float32_inputs(self, sample_inputs_df, optimiser_params):
+        """Test that float32 inputs are solved in float64."""
+        from_df = mvp_cost_minimiser(inputs_df=sample_inputs_df, **optimiser_params)
+        arrays = OptimiserInputs(
+            pd.DatetimeIndex(sample_inputs_df["period_end"]),
+            *(sample_inputs_df[col].to_numpy(dtype=np.float32)
+              for col in ["price", "pv_estimate", "demand", "export_price"]),
+        )
+        result = mvp_cost_minimiser(inputs_df=arrays, **optimiser_params)
+        assert result["cost_gbp"].dtype == np.float64
+        assert result["cost_gbp"].sum() == pytest.approx(from_df["cost_gbp"].sum(), abs=1e-4)
+
+    def test_optimiser_normalises_inputs_once(self, sample_inputs_df):
+        """Test that re-normalising already-normalised inputs reuses their arrays."""
+        normalised = _as_optimiser_inputs(sample_inputs_df)
+        again = _as_optimiser_inputs(normalised)
+        for before, after in zip(normalised[1:], again[1:]):
+            assert np.shares_memory(before, after)
@@ -1,25 +1,101 @@
 """Tests for service integrations (with mocks)."""
+import io
 import pytest
+import numpy as np
 import pandas as pd
+from datetime import datetime, time
 from unittest.mock import patch, MagicMock
-from app.services import solcast, foxess, forecast
+from app.core.optimiser import OptimiserInputs
+from app.services import solcast, foxess, forecast, data_provider, octopus
+
+
+@pytest.fixture(autouse=True)
+def clear_api_caches():
+    """Stop cached external API responses leaking between tests."""
+    solcast._fetch_solar_forecast.cache_clear()
+    solcast._solcast_latest_period_end.cache_clear()
+    foxess._fetch_agile_prices.cache_clear()
+    yield
+
+
+class TestDataProvider:
+    """Test DB-backed optimiser inputs."""
+
+    @patch('app.services.data_provider.SessionLocal')
+    def test_get_optimiser_inputs_returns_arrays(self, mock_session_cls):
+        """Test that DB rows are converted to UTC timestamps and float64 arrays."""
+        execute = mock_session_cls.return_value.execute
+        execute.return_value.__iter__.return_value = iter([
+            (datetime(2025, 9, 20, 0, 30), 0.0, 15.0, 5.0, 0.4),
+            (datetime(2025, 9, 20, 1, 0), 0.1, 20.0, 6.0, None),
+        ])
+        result = data_provider.get_optimiser_inputs()
+        assert str(result.period_end.tz) == "UTC"
+        assert result.price.dtype == np.float64
+        np.testing.assert_array_equal(result.export_price, [5.0, 6.0])
+        assert np.isnan(result.demand[1])
+        execute.assert_called_once_with(data_provider._OPTIMISER_SQL, {"days": 7})
+        mock_session_cls.return_value.close.assert_called_once()
+
+    @patch('app.services.data_provider.SessionLocal')
+    def test_get_optimiser_inputs_empty(self, mock_session_cls):
+        """Test that no rows gives empty arrays rather than an error."""
+        mock_session_cls.return_value.execute.return_value.__iter__.return_value = iter([])
+        result = data_provider.get_optimiser_inputs()
+        assert result.period_end.size == 0
+        assert result.demand.size == 0
+
+    @patch('app.services.data_provider.SessionLocal')
+    def test_get_demand_profile_returns_slots(self, mock_session_cls):
+        """Test that the SQL half-hour profile comes back keyed by integer slot."""
+        mock_session_cls.return_value.execute.return_value.all.return_value = [(0, 0.4), (1, 0.35)]
+        result = data_provider.get_demand_profile(days=3)
+        assert list(result.columns) == ["hh_slot", "energy_kwh"]
+        assert result["hh_slot"].tolist() == [0, 1]
+        mock_session_cls.return_value.execute.assert_called_once_with(data_provider._DEMAND_PROFILE_SQL, {"days": 3})
+        mock_session_cls.return_value.close.assert_called_once()
 
 
 class TestSolcast:
     """Test Solcast service."""
 
-    @patch('app.services.solcast.requests.get')
+    @patch('app.services.solcast._session.get')
     def test_get_solar_forecast_returns_dataframe(self, mock_get):
         """Test that get_solar_forecast returns DataFrame with correct columns."""
         # Mock CSV response
         mock_response = MagicMock()
-        mock_response.content = b"PeriodEnd,PvEstimate\n2025-09-20T00:00:00Z,0.1\n2025-09-20T00:30:00Z,0.2"
-        mock_get.return_value = mock_response
+        mock_response.raw = io.BytesIO(
+            b"PeriodEnd,Period,PvEstimate,PvEstimate10\n"
+            b"2025-09-20T00:00:00Z,PT30M,0.1,0.05\n2025-09-20T00:30:00Z,PT30M,0.2,0.1"
+        )
+        mock_get.return_value.__enter__.return_value = mock_response
         
         result = solcast.get_solar_forecast("test_key", "test_id")
         assert isinstance(result, pd.DataFrame)
         assert "PeriodEnd" in result.columns
         assert "PvEstimate" in result.columns
+        assert result["PvEstimate"].tolist() == [0.05, 0.1]
+
+    @patch('app.services.solcast._session.get')
+    def test_get_solar_forecast_caches_api_response(self, mock_get):
+        """Test that repeat calls within the TTL reuse the fetched forecast."""
+        mock_get.return_value.__enter__.return_value.raw = io.BytesIO(b"PeriodEnd,PvEstimate\n2025-09-20T00:00:00Z,0.1")
+        first = solcast.get_solar_forecast("test_key", "test_id")
+        first["PvEstimate"] = 99.0
+        second = solcast.get_solar_forecast("test_key", "test_id")
+        mock_get.assert_called_once()
+        assert second["PvEstimate"].tolist() == [0.05]
+
+    @patch('app.services.solcast._session.get')
+    @patch('app.services.solcast.get_optimiser_inputs')
+    @patch('app.services.solcast.get_latest_solcast_period_end')
+    def test_get_solar_forecast_skips_stale_db(self, mock_latest, mock_inputs, mock_get):
+        """Test that a stale DB forecast goes straight to the API without the inputs join."""
+        mock_latest.return_value = datetime(2020, 1, 1)
+        mock_get.return_value.__enter__.return_value.raw = io.BytesIO(b"PeriodEnd,PvEstimate\n2025-09-20T00:00:00Z,0.1")
+        result = solcast.get_solar_forecast("test_key", "test_id")
+        mock_inputs.assert_not_called()
+        assert len(result) == 1
 
     def test_get_solar_forecast_requires_credentials(self):
         """Test that get_solar_forecast raises error if credentials missing."""
@@ -27,6 +103,22 @@ class TestSolcast:
             solcast.get_solar_forecast(None, None)
 
 
+class TestOctopus:
+    """Test Octopus Energy service."""
+
+    @patch('app.services.octopus._session.get')
+    def test_get_consumption_parses_mixed_offsets_to_utc(self, mock_get):
+        """Test that GMT and BST interval ends both come back as UTC."""
+        mock_get.return_value.json.return_value = {"results": [
+            {"consumption": 0.2, "interval_start": "2025-03-30T00:00:00Z", "interval_end": "2025-03-30T00:30:00Z"},
+            {"consumption": 0.3, "interval_start": "2025-03-30T02:00:00+01:00", "interval_end": "2025-03-30T02:30:00+01:00"},
+        ]}
+        result = octopus.get_consumption("test_key", "mpan", "serial")
+        assert str(result["interval_end"].dt.tz) == "UTC"
+        assert result["interval_end"].dt.hour.tolist() == [0, 1]
+        assert result["energy_kwh"].tolist() == [0.2, 0.3]
+
+
 class TestFoxess:
     """Test FoxESS service."""
 
@@ -63,14 +155,66 @@ class TestFoxess:
         result = foxess.get_demand_forecast()
         assert isinstance(result, pd.DataFrame)
         assert "time_of_day" in result.columns
+        assert "hh_slot" in result.columns
         assert "energy_kwh" in result.columns
 
+    @patch('app.services.foxess.get_demand_profile')
+    def test_get_demand_forecast_uses_db_profile(self, mock_profile):
+        """Test that the DB demand profile maps slots back to times of day."""
+        mock_profile.return_value = pd.DataFrame({"hh_slot": [0, 37], "energy_kwh": [0.4, 0.9]})
+        result = foxess.get_demand_forecast(days=7)
+        assert result["time_of_day"].tolist() == [time(0, 0), time(18, 30)]
+        assert result["hh_slot"].tolist() == [0, 37]
+        assert result["energy_kwh"].tolist() == [0.4, 0.9]
+
     @patch('app.services.foxess.FOXESS_API_KEY', None)
     def test_init_api_requires_key(self):
         """Test that init_api raises error when key is missing."""
         with pytest.raises(ValueError, match="FoxESS API key"):
             foxess.init_api(None)
 
+    def test_create_foxess_schedule_df_work_modes(self):
+        """Test that net battery flow maps to charge/discharge/self-use slots."""
+        optimiser_result = pd.DataFrame({
+            "PeriodEnd": pd.date_range("2025-09-20 00:00", periods=4, freq="30min", tz="UTC"),
+            "net_battery_kwh": [0.5, -0.5, 0.01, np.nan],
+        })
+        schedule = foxess.create_foxess_schedule_df(optimiser_result)
+        assert list(schedule["start"]) == ["23:30", "00:00", "00:30", "01:00"]
+        assert list(schedule["end"]) == ["00:00", "00:30", "01:00", "01:30"]
+        assert list(schedule["WorkMode"]) == [
+            foxess.FOXESS_WORK_MODE_CHARGE,
+            foxess.FOXESS_WORK_MODE_DISCHARGE,
+            foxess.FOXESS_WORK_MODE_SELF_USE,
+            foxess.FOXESS_WORK_MODE_SELF_USE,
+        ]
+
+    def test_send_schedule_groups_contiguous_modes(self):
+        """Test that send_schedule merges runs of one mode and splits them at midnight."""
+        schedule = pd.DataFrame({
+            "start": ["23:00", "23:30", "00:00", "00:30"],
+            "end": ["23:30", "00:00", "00:30", "01:00"],
+            "WorkMode": [1, 1, 1, 0],
+        })
+        with patch.object(foxess.f, "signed_post", create=True) as mock_post:
+            foxess.send_schedule("SN123", schedule)
+
+        groups = mock_post.call_args.kwargs["body"]["groups"]
+        assert [(g["startHour"], g["startMinute"], g["endHour"], g["endMinute"], g["workMode"]) for g in groups] == [
+            (23, 0, 23, 59, 1),
+            (0, 0, 0, 29, 1),
+            (0, 30, 0, 59, 0),
+        ]
+        assert groups[0]["minSocOnGrid"] == 20 and groups[0]["maxSoc"] == 90
+
+    def test_send_schedule_empty(self):
+        """Test that an empty schedule posts an empty group list."""
+        schedule = pd.DataFrame({"start": [], "end": [], "WorkMode": []})
+        with patch.object(foxess.f, "signed_post", create=True) as mock_post:
+            foxess.send_schedule("SN123", schedule)
+
+        assert mock_post.call_args.kwargs["body"] == {"deviceSN": "SN123", "groups": []}
+
 
 class TestForecast:
     """Test forecast helpers."""
@@ -87,10 +231,11 @@ class TestForecast:
         assert isinstance(result, pd.DataFrame)
         assert len(result) > 0
 
+    @patch('app.services.forecast.get_optimiser_inputs', side_effect=Exception("no db"))
     @patch('app.services.forecast.solcast.get_solar_forecast')
     @patch('app.services.forecast.foxess.init_api')
     @patch('app.services.forecast.foxess.get_agile_prices')
-    def test_forecast_solar_and_prices(self, mock_prices, mock_init, mock_solar):
+    def test_forecast_solar_and_prices(self, mock_prices, mock_init, mock_solar, mock_inputs):
         """Test combined solar + prices forecast."""
         mock_solar.return_value = pd.DataFrame({
             "PeriodEnd": pd.date_range("2025-09-20", periods=2, freq="30min", tz="UTC"),
@@ -100,11 +245,34 @@ class TestForecast:
             "PeriodEnd": pd.date_range("2025-09-20", periods=2, freq="30min", tz="UTC"),
             "price": [15.0, 20.0]
         })
-        result = forecast.forecast_solar_and_prices("test_id")
+        with patch.dict('os.environ', {"FOXESS_API_KEY": "test_key", "SOLCAST_API_KEY": "solcast_key"}):
+            result = forecast.forecast_solar_and_prices("test_id")
         assert isinstance(result, pd.DataFrame)
         assert "PeriodEnd" in result.columns
         assert "PvEstimate" in result.columns
         assert "price" in result.columns
+        mock_solar.assert_called_once_with("solcast_key", "test_id", prefer_db=False)
+        mock_prices.assert_called_once_with(prefer_db=False)
+
+    @patch('app.services.forecast.get_optimiser_inputs')
+    @patch('app.services.forecast.solcast.get_solar_forecast')
+    @patch('app.services.forecast.foxess.get_agile_prices')
+    def test_forecast_solar_and_prices_joins_db_once(self, mock_prices, mock_solar, mock_inputs):
+        """Test that DB inputs supply both solar and prices from a single query."""
+        mock_inputs.return_value = OptimiserInputs(
+            pd.date_range("2025-09-20 00:30", periods=2, freq="30min", tz="UTC"),
+            price=np.array([15.0, 20.0]),
+            pv_estimate=np.array([0.1, 0.2]),
+            demand=np.array([0.4, 0.5]),
+            export_price=np.array([5.0, 6.0]),
+        )
+        with patch.dict('os.environ', {"FOXESS_API_KEY": "test_key"}):
+            result = forecast.forecast_solar_and_prices("test_id")
+        mock_inputs.assert_called_once()
+        mock_solar.assert_not_called()
+        mock_prices.assert_not_called()
+        assert result["price"].tolist() == [15.0, 20.0]
+        assert result["hh_slot"].tolist() == [1, 2]
 
     @patch('app.services.forecast.FOXESS_API_KEY', None)
     def test_forecast_demand_requires_api_key(self):